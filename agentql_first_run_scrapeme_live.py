@@ -1,12 +1,109 @@
 import agentql
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import json
 from datetime import datetime
 import logging
-from urllib.parse import urlparse
+from logging.handlers import QueueHandler, QueueListener
+import queue
+import atexit
+from urllib.parse import urlparse, urlsplit
+import mimetypes
 import os
+import re
+from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import shutil
+import tempfile
+from html import escape
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of concurrent image downloads
+MAX_DOWNLOAD_WORKERS = 16
+
+# Seconds to wait for an image server to connect/respond
+DOWNLOAD_TIMEOUT = 10
+
+# Images larger than this (or of unknown size) are streamed to disk in chunks
+STREAM_THRESHOLD_BYTES = 1024 * 1024
+
+# Chunk size for streamed image writes
+COPY_BUFFER_BYTES = 1024 * 1024
+
+# Shared HTTP session so image downloads reuse pooled keep-alive connections.
+# All thumbnails come from one host, so a single pool sized to the worker count suffices.
+_SESSION = requests.Session()
+_SESSION.headers['User-Agent'] = 'agentql-first-steps/1.0'
+_ADAPTER = HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_DOWNLOAD_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.2),
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# Characters not allowed in image filenames (each replaced by '_')
+_CLEAN_RE = re.compile(r'\W')
+
+# Shop page to scrape
+SHOP_URL = "https://scrapeme.live/shop/"
+
+# Element that marks the product list as rendered on SHOP_URL (a WooCommerce shop)
+SHOP_READY_SELECTOR = "ul.products li.product"
+
+# Milliseconds to wait for a page's ready selector before querying anyway
+READY_SELECTOR_TIMEOUT_MS = 10000
+
+# AgentQL query for product data
+PRODUCTS_QUERY = """
+{
+    products[] {
+        name
+        price
+        thumbnail
+    }
+}
+"""
+
+# Persistent Chromium profile so cookies and site storage survive between runs
+BROWSER_PROFILE_DIR = ".pw-profile"
+
+# Resource types the browser never needs to fetch; images are downloaded separately
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+# Source of this script, read once at import and embedded in the HTML report
+_SCRIPT_CONTENT = Path(__file__).read_text(encoding='utf-8')
+
+# Static document head shared by every generated HTML report
+_HTML_HEAD = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>Scraped Data</title>
+    <style>
+        .product { margin: 20px; padding: 10px; border: 1px solid #ddd; }
+        img { max-width: 200px; }
+        code { 
+            display: block;
+            white-space: pre-wrap;
+            background-color: #f4f4f4;
+            padding: 15px;
+            margin: 10px 0;
+            border-radius: 5px;
+        }
+    </style>
+</head>
+<body>
+"""
+
+_HTML_TAIL = "</body></html>"
+
+# Markup for a single product card; fields must be HTML-escaped before substitution
+_PRODUCT_TMPL = (
+    '<div class="product"><h2>{name}</h2><p>Price: {price}</p>'
+    '<img src="{thumbnail}" alt="{name}"></div>\n'
+)
 
 def setup_logging():
     """
@@ -18,17 +115,88 @@ def setup_logging():
     - Output: Both 'scraping.log' file and console output
     - File Handler: Appends to 'scraping.log'
     - Stream Handler: Prints to console
+    
+    Records are put on an in-memory queue by the root logger and written to the
+    file and console by a background QueueListener, so download workers never
+    block on log I/O. The listener is stopped (and the queue drained) at exit.
     """
+    log_queue = queue.Queue(-1)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    
+    file_handler = logging.FileHandler('scraping.log')
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    
+    listener = QueueListener(log_queue, file_handler, stream_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    
+    # Only the message is rendered on the queue side; the listener's handlers add the prefix
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('scraping.log'),
-            logging.StreamHandler()
-        ]
+        handlers=[queue_handler]
     )
 
-def generate_html(data, filename, script_content, domain, timestamp):
+def block_heavy_resources(route):
+    """
+    Playwright route handler that aborts requests for heavy static assets.
+    
+    Args:
+        route (playwright.sync_api.Route): Intercepted network request
+    
+    Aborts requests whose resource type is in BLOCKED_RESOURCE_TYPES and
+    lets everything else through. Product data only needs the DOM text,
+    and thumbnails are fetched later by download_images().
+    """
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        route.abort()
+    else:
+        route.continue_()
+
+def scrape_products(context, url, ready_selector=None):
+    """
+    Load a shop page in its own tab and extract product data with AgentQL.
+    
+    Args:
+        context (playwright.sync_api.BrowserContext): Browser context to open the page in
+        url (str): URL of the shop page to scrape
+        ready_selector (str, optional): CSS selector to wait for before querying.
+            If it does not appear within READY_SELECTOR_TIMEOUT_MS, a warning is
+            logged and the query still runs.
+    
+    Returns:
+        dict: AgentQL response with a 'products' list (name, price, thumbnail)
+    
+    Each call opens and closes its own page, so several URLs (e.g. paginated
+    shop pages) can be scraped in turn from the same context.
+    """
+    page = agentql.wrap(context.new_page())
+    try:
+        # Skip images, fonts and stylesheets; only the DOM is queried
+        page.route("**/*", block_heavy_resources)
+        page.goto(url)
+        
+        # Wait for the DOM and, if given, the element the query depends on
+        page.wait_for_load_state("domcontentloaded")  # DOM fully loaded
+        if ready_selector:
+            try:
+                page.locator(ready_selector).first.wait_for(
+                    state="attached", timeout=READY_SELECTOR_TIMEOUT_MS
+                )
+            except PlaywrightTimeoutError:
+                logging.warning(f"Selector {ready_selector!r} not found on {url}; querying anyway")
+        logging.info(f"Page loaded successfully: {url}")
+        
+        # Execute query and get response
+        return page.query_data(PRODUCTS_QUERY)
+    finally:
+        page.close()
+
+def generate_html(data, filename, script_content, domain, timestamp, json_text):
     """
     Generate an HTML file from the scraped product data.
     
@@ -38,6 +206,7 @@ def generate_html(data, filename, script_content, domain, timestamp):
         script_content (str): Content of the Python script
         domain (str): Domain name of scraped website
         timestamp (str): Timestamp of the scrape
+        json_text (str): Pre-serialized JSON of ``data``, HTML-escaped when embedded
     
     Creates an HTML file with:
     - H1 header with website name and timestamp
@@ -46,53 +215,36 @@ def generate_html(data, filename, script_content, domain, timestamp):
     - Product cards with name, price, and thumbnail
     """
     try:
-        html_content = """
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Scraped Data</title>
-            <style>
-                .product { margin: 20px; padding: 10px; border: 1px solid #ddd; }
-                img { max-width: 200px; }
-                code { 
-                    display: block;
-                    white-space: pre-wrap;
-                    background-color: #f4f4f4;
-                    padding: 15px;
-                    margin: 10px 0;
-                    border-radius: 5px;
-                }
-            </style>
-        </head>
-        <body>
-        """
-        
-        # Add website name and timestamp as H1
-        html_content += f"<h1>Website: {domain} - Scraped at: {timestamp}</h1>"
-        
-        # Add Python script
-        html_content += "<h2>Python Script Used:</h2>"
-        html_content += f"<code>{script_content}</code><br>"
-        
-        # Add JSON data
-        html_content += "<h2>Scraped JSON Data:</h2>"
-        html_content += f"<code>{json.dumps(data, indent=4)}</code><br>"
-        
-        # Add products
-        html_content += "<h2>Products:</h2>"
-        for product in data['products']:
-            html_content += f"""
-            <div class="product">
-                <h2>{product['name']}</h2>
-                <p>Price: {product['price']}</p>
-                <img src="{product['thumbnail']}" alt="{product['name']}">
-            </div>
-            """
-        
-        html_content += "</body></html>"
-        
+        # Write each fragment straight to the file as it is produced
         with open(filename, 'w', encoding='utf-8') as f:
-            f.write(html_content)
+            f.write(_HTML_HEAD)
+            
+            # Add website name and timestamp as H1
+            f.write(f"<h1>Website: {domain} - Scraped at: {timestamp}</h1>")
+            
+            # Add Python script
+            f.write("<h2>Python Script Used:</h2>")
+            f.write(f"<code>{escape(script_content)}</code><br>")
+            
+            # Add JSON data
+            f.write("<h2>Scraped JSON Data:</h2>")
+            f.write(f"<code>{escape(json_text)}</code><br>")
+            
+            # Add products
+            f.write("<h2>Products:</h2>")
+            write = f.write
+            render_product = _PRODUCT_TMPL.format_map
+            for product in data['products']:
+                name, price, thumb = product['name'], product['price'], product['thumbnail']
+                # Escape each field once; the name is reused for the alt text
+                fields = {
+                    'name': escape(str(name)),
+                    'price': escape(str(price)),
+                    'thumbnail': escape(str(thumb), quote=True),
+                }
+                write(render_product(fields))
+            
+            f.write(_HTML_TAIL)
         logging.info(f"HTML file generated: {filename}")
     except Exception as e:
         logging.error(f"Error generating HTML: {str(e)}")
@@ -130,7 +282,7 @@ def setup_project_folders(domain, timestamp):
         logging.error(f"Error creating project folders: {str(e)}")
         raise
 
-def download_images(data, images_folder):
+def download_images(data, images_folder, cache_folder):
     """
     Download and save product images from the scraped data.
     
@@ -147,11 +299,15 @@ def download_images(data, images_folder):
                 ]
             }
         images_folder (str): Path to folder where images will be saved
+        cache_folder (str): Path to a folder shared across runs; images found
+            there are reused instead of being downloaded again
     
-    For each product:
+    For each product (downloaded concurrently in a thread pool):
     1. Cleans product name for use in filename
-    2. Downloads image from thumbnail URL
-    3. Saves image with format: ProductName_original-image-name.ext
+    2. Reuses the image from cache_folder if a non-empty copy is already there
+    3. Otherwise downloads image from thumbnail URL into cache_folder
+    4. Links (or copies) the image into images_folder with format:
+       ProductName_original-image-name.ext
     
     Handles errors:
     - Individual image download failures
@@ -160,28 +316,101 @@ def download_images(data, images_folder):
     
     Logs:
     - Successful downloads with product name and filename
+    - Images reused from the cache
+    - A summary of saved images and the products whose image failed
     - Failed downloads with error details
     - General function errors
     """
-    try:
-        for idx, product in enumerate(data['products']):
-            try:
-                image_url = product['thumbnail']
-                clean_name = ''.join(c if c.isalnum() else '_' for c in product['name'])
-                original_filename = os.path.basename(image_url)
-                image_name = f"{clean_name}_{original_filename}"
-                image_path = os.path.join(images_folder, image_name)
+    images_dir = Path(images_folder)
+    cache_dir = Path(cache_folder)
+    
+    def _is_cached(cached_path):
+        """Return True if a complete copy of the image is already in the cache."""
+        return cached_path.is_file() and cached_path.stat().st_size > 0
+    
+    def _place(cached_path, image_name):
+        """Hard-link a cached image into this run's folder, copying if linking fails."""
+        image_path = images_dir / image_name
+        try:
+            os.link(cached_path, image_path)
+        except FileExistsError:
+            # Already placed, e.g. by another product with the same image name
+            return
+        except OSError:
+            shutil.copyfile(cached_path, image_path)
+    
+    def _fetch(product):
+        """Download a single product image. Returns (product name, ok, error)."""
+        try:
+            name, image_url = product['name'], product['thumbnail']
+            clean_name = _CLEAN_RE.sub('_', name)
+            # Take the filename from the URL path so query strings never end up in it
+            original_filename = urlsplit(image_url).path.rpartition('/')[2] or 'img'
+            image_name = f"{clean_name}_{original_filename}"
+            cached_path = cache_dir / image_name
+            
+            # Reuse images downloaded by an earlier run. Names without an extension
+            # only get their final name from the response, so they are checked below.
+            if cached_path.suffix and _is_cached(cached_path):
+                _place(cached_path, image_name)
+                logging.info(f"Cached image: {image_name} for product: {name}")
+                return name, True, None
+            
+            with _SESSION.get(image_url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+                if response.status_code != 200:
+                    logging.error(f"Failed to download image: {image_url} for product: {name}")
+                    return name, False, f"HTTP {response.status_code}"
                 
-                response = requests.get(image_url, stream=True)
-                if response.status_code == 200:
-                    with open(image_path, 'wb') as f:
-                        response.raw.decode_content = True
-                        shutil.copyfileobj(response.raw, f)
-                    logging.info(f"Downloaded image: {image_name} for product: {product['name']}")
-                else:
-                    logging.error(f"Failed to download image: {image_url} for product: {product['name']}")
-            except Exception as e:
-                logging.error(f"Error processing image for product {product['name']}: {str(e)}")
+                # URL had no extension: derive one from the response's Content-Type
+                if not cached_path.suffix:
+                    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+                    extension = mimetypes.guess_extension(content_type) if content_type else None
+                    if extension:
+                        image_name += extension
+                        cached_path = cache_dir / image_name
+                    
+                    # Check again now that the final name is known; the body is not read
+                    if _is_cached(cached_path):
+                        _place(cached_path, image_name)
+                        logging.info(f"Cached image: {image_name} for product: {name}")
+                        return name, True, None
+                
+                # Write to a temporary file unique to this worker so an interrupted download
+                # is never treated as cached and products sharing a filename cannot collide
+                with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.part', delete=False) as f:
+                    partial_path = Path(f.name)
+                    try:
+                        # Small images are written in one call; only large ones are streamed
+                        content_length = int(response.headers.get('Content-Length') or 0)
+                        if 0 < content_length <= STREAM_THRESHOLD_BYTES:
+                            f.write(response.content)
+                        else:
+                            response.raw.decode_content = True
+                            shutil.copyfileobj(response.raw, f, length=COPY_BUFFER_BYTES)
+                    except BaseException:
+                        f.close()
+                        partial_path.unlink(missing_ok=True)
+                        raise
+                os.replace(partial_path, cached_path)
+            
+            _place(cached_path, image_name)
+            logging.info(f"Downloaded image: {image_name} for product: {name}")
+            return name, True, None
+        except Exception as e:
+            name = product.get('name')
+            logging.error(f"Error processing image for product {name}: {str(e)}")
+            return name, False, str(e)
+    
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_WORKERS) as ex:
+            results = list(ex.map(_fetch, data['products']))
+        
+        # Each failure was already logged by its worker; summarize the run here
+        failed = [name for name, ok, err in results if not ok]
+        logging.info(f"Images saved: {len(results) - len(failed)} of {len(results)}")
+        if failed:
+            logging.warning(f"Images failed for products: {', '.join(map(str, failed))}")
                 
     except Exception as e:
         logging.error(f"Error in download_images function: {str(e)}")
@@ -190,56 +419,32 @@ try:
     # Initialize logging system
     setup_logging()
     
-    with sync_playwright() as playwright, playwright.chromium.launch(headless=False) as browser:
-        # Initialize browser and create new page with AgentQL wrapper
-        page = agentql.wrap(browser.new_page())
-        page.goto("https://scrapeme.live/shop/")
-        
-        # Explicit wait for page loading
-        print("Waiting 3 seconds for page to load completely...")
-        logging.info("Waiting 3 seconds for page to load completely...")
-        page.wait_for_timeout(3000)  # 3000ms = 3 seconds
-        
-        # Wait for complete page load
-        page.wait_for_load_state("networkidle")    # No network activity for 500ms
-        page.wait_for_load_state("domcontentloaded")  # DOM fully loaded
-        logging.info("Page loaded successfully")
-        
-        # Define query for product data
-        QUERY = """
-        {
-            products[] {
-                name
-                price
-                thumbnail
-            }
-        }
-        """
-
-        # Execute query and get response
-        response = page.query_data(QUERY)
+    with sync_playwright() as playwright, playwright.chromium.launch_persistent_context(
+        user_data_dir=BROWSER_PROFILE_DIR, headless=True
+    ) as context:
+        # Reuse the on-disk browser profile (cookies, storage) for the scrape
+        response = scrape_products(context, SHOP_URL, SHOP_READY_SELECTOR)
         
         # Setup folder structure for current run
-        domain = urlparse("https://scrapeme.live/shop/").netloc[:10]
+        domain = urlparse(SHOP_URL).netloc[:10]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         project_folder, images_folder = setup_project_folders(domain, timestamp)
         
+        # Serialize once; reused for the JSON file and the HTML report
+        json_text = json.dumps(response, indent=4, ensure_ascii=False)
+        
         # Save scraped data as JSON
         json_filename = os.path.join(project_folder, f"{domain}_{timestamp}.json")
         with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(response, f, indent=4)
+            f.write(json_text)
         logging.info(f"JSON file saved: {json_filename}")
         
-        # Get the content of the current script
-        with open(__file__, 'r', encoding='utf-8') as f:
-            script_content = f.read()
-        
         # Generate HTML representation
         html_filename = os.path.join(project_folder, f"{domain}_{timestamp}.html")
-        generate_html(response, html_filename, script_content, domain, timestamp)
+        generate_html(response, html_filename, _SCRIPT_CONTENT, domain, timestamp, json_text)
         
-        # Download product images
-        download_images(response, images_folder)
+        # Download product images, reusing any already fetched for this domain
+        download_images(response, images_folder, f"{domain}_images")
         
 except Exception as e:
     logging.error(f"An error occurred: {str(e)}")
\ No newline at end of file